@@ -1,72 +1,493 @@
 import flet as ft
+import codecs
 import csv
 import math
+import mmap
 import os
 import threading
-import time
-import subprocess
-from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate, islice
+from pathlib import Path
+
+# 可选依赖：编译实现的编码检测器，未安装时退回逐个尝试解码
+try:
+    import cchardet as _cchardet
+except ImportError:
+    _cchardet = None
+
+try:
+    from charset_normalizer import from_bytes as _cn_from_bytes
+except ImportError:
+    _cn_from_bytes = None
+
+# 可选依赖：Numba 编译的并行换行计数，用于大文件
+try:
+    import numba as _numba
+    import numpy as _np
+except ImportError:
+    _numba = None
+
+if _numba is None:
+    _count_nl_numba = None
+else:
+    try:
+        @_numba.njit(parallel=True, cache=True, boundscheck=False)
+        def _count_nl_numba(arr):
+            newlines = 0
+            quotes = 0
+            for i in _numba.prange(arr.shape[0]):
+                if arr[i] == 10:
+                    newlines += 1
+                elif arr[i] == 34:
+                    quotes += 1
+            return newlines, quotes
+    except Exception:
+        _count_nl_numba = None  # 例如打包后的程序无法写入编译缓存
+
+# 逐个尝试的候选编码。cp936 在 Python 中就是 gbk 的别名，gb2312 是 gbk 的子集，
+# gbk 解码失败时二者也必然失败，因此不再重复尝试
+_FALLBACK_ENCODINGS = ('utf-8', 'gbk', 'big5')
+
+# csv 解析模式下每次 writerows 写出的最大行数
+_CSV_BATCH_ROWS = 10000
+
+# 拷贝过程中检查取消标志的间隔
+_CANCEL_CHECK_LINES = 1024
+_CANCEL_CHECK_BYTES = 16 << 20
+
+# 写出拆分文件时使用原始 fd (Windows 下需要二进制模式)
+_OUT_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
 
 
 # ==========================================
 # 1. 后端逻辑 (经过改造以适配 GUI)
 # ==========================================
 
-def detect_encoding(file_path):
-    """检测文件编码"""
-    encodings_to_try = ['utf-8-sig', 'gbk', 'gb2312', 'utf-8', 'cp936', 'big5']
-    for encoding in encodings_to_try:
+def detect_encoding(file_path, sample_size=65536):
+    """
+    检测文件编码 (只读取一次采样数据，在内存中尝试解码)
+    返回 (encoding, strict_ok)，strict_ok 表示采样能否按该编码无错误解码
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+
+    # 采样可能截断在多字节字符中间，未读完整个文件时不要求末尾完整
+    final = len(sample) < sample_size
+
+    def can_decode(encoding):
         try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                f.read(2048)
-                return encoding
-        except (UnicodeDecodeError, UnicodeError):
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=final)
+            return True
+        except (UnicodeDecodeError, LookupError):
+            return False
+
+    # BOM 可以直接确定编码
+    if sample.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig', can_decode('utf-8-sig')
+    if sample.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16', can_decode('utf-16')
+
+    # 优先使用检测库，结果需通过一次严格解码校验
+    encoding = _detect_with_library(sample)
+    if encoding and can_decode(encoding):
+        return encoding, True
+
+    for encoding in _FALLBACK_ENCODINGS:
+        if can_decode(encoding):
+            return encoding, True
+    return 'gbk', False
+
+
+def _detect_with_library(sample):
+    """使用 cchardet / charset-normalizer 检测编码，均不可用或无结果时返回 None"""
+    encoding = None
+    try:
+        if _cchardet is not None:
+            encoding = _cchardet.detect(sample).get('encoding')
+        elif _cn_from_bytes is not None:
+            best = _cn_from_bytes(sample).best()
+            encoding = best.encoding if best is not None else None
+    except Exception:
+        return None
+    if not encoding:
+        return None
+
+    try:
+        encoding = codecs.lookup(encoding).name
+    except LookupError:
+        return None
+    if encoding in ('gb2312', 'cp936'):
+        return 'gbk'
+    if encoding == 'ascii':
+        return 'utf-8'
+    return encoding
+
+
+def _open_binary_seq(file_path, buffering=1 << 20):
+    """以大缓冲区打开二进制文件，并提示内核将按顺序读取 (仅支持 posix_fadvise 的系统)"""
+    f = open(file_path, 'rb', buffering=buffering)
+    try:
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    except (AttributeError, OSError):
+        pass
+    return f
+
+
+def _count_lines_numba(file_path):
+    """使用 Numba 在整个文件的 mmap 视图上并行统计 (行数, 引号数)，不可用时返回 None"""
+    try:
+        with open(file_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            arr = _np.frombuffer(mm, dtype=_np.uint8)
+            try:
+                count, quotes = _count_nl_numba(arr)
+                count, quotes = int(count), int(quotes)
+                last = mm[-1:]
+            finally:
+                del arr  # 释放对 mmap 的引用，否则无法关闭
+    except Exception:
+        return None
+    if last != b'\n':
+        count += 1
+    return count, quotes
+
+
+def _count_lines_binary(file_path, bufsize=1 << 20, numba_min_size=64 << 20, cancel_event=None):
+    """
+    以二进制方式按块统计行数 (换行符 0x0A 在各候选编码中含义一致，无需解码)
+    返回 (行数, 引号数)，引号总数为奇数说明存在跨行的引号字段或引号不配对
+    cancel_event 被 set 后在下一块停止，返回值不完整，调用方需自行检查
+    """
+    # 大文件优先使用 Numba (若已安装)，小文件的编译开销不划算
+    if _count_nl_numba is not None and os.path.getsize(file_path) >= numba_min_size:
+        if cancel_event is not None and cancel_event.is_set():
+            return 0, 0
+        result = _count_lines_numba(file_path)
+        if result is not None:
+            return result
+
+    with _open_binary_seq(file_path) as f:
+        read = f.read
+        count = 0
+        quotes = 0
+        last = b''
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            buf = read(bufsize)
+            if not buf:
+                break
+            count += buf.count(b'\n')
+            quotes += buf.count(b'"')
+            last = buf
+    # 最后一行没有换行符时也算一行
+    if last and last[-1:] != b'\n':
+        count += 1
+    return count, quotes
+
+
+def _count_csv_records(file_path, encoding, errors='strict', cancel_event=None):
+    """
+    解码后按 csv 记录计数 (含表头)，与 csv 解析模式的拆分方式一致
+    引号内换行不会多算，也适用于 UTF-16 等换行符不是单字节 0x0A 的编码
+    每 1024 条记录检查一次是否已取消
+    """
+    with open(file_path, 'r', encoding=encoding, errors=errors, newline='') as f:
+        reader = csv.reader(f)
+        count = 0
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            block = sum(1 for _ in islice(reader, _CANCEL_CHECK_LINES))
+            count += block
+            if block < _CANCEL_CHECK_LINES:
+                break
+        return count
+
+
+def _has_multiline_fields(file_path, sample_size=1 << 20):
+    """
+    粗略检查采样中是否存在引号内换行 (某一物理行的引号数为奇数)
+    存在时不能按物理行拆分，需要交给 csv 模块解析
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+    if b'"' not in sample:
+        return False
+    lines = sample.split(b'\n')
+    if len(sample) == sample_size:
+        lines.pop()  # 最后一段可能是被截断的半行
+    return any(line.count(b'"') % 2 for line in lines)
+
+
+def _iter_lines_reusable(fbin, bufsize=1 << 16):
+    """
+    复用同一个 bytearray 缓冲区逐行读取，产出包含换行符的 memoryview
+    产出的行在下一次迭代前有效，调用方需在此之前写出或复制
+    """
+    buf = bytearray(bufsize)
+    start = end = 0  # 有效数据为 buf[start:end]
+    while True:
+        nl = buf.find(b'\n', start, end)
+        if nl >= 0:
+            with memoryview(buf)[start:nl + 1] as line:
+                yield line
+            start = nl + 1
             continue
-    return 'gbk'
 
+        # 缓冲区内没有完整的行：把残留的半行移到开头，必要时扩容 (超长行)
+        if start:
+            buf[:end - start] = buf[start:end]
+            end -= start
+            start = 0
+        if end == len(buf):
+            buf.extend(bytes(len(buf)))
 
-def split_csv_logic(file_path, num_parts, output_folder, log_callback, progress_callback):
+        with memoryview(buf)[end:] as free:
+            n = fbin.readinto(free)
+        if not n:
+            if end > start:
+                with memoryview(buf)[start:end] as line:
+                    yield line  # 最后一行没有换行符
+            return
+        end += n
+
+
+def _copy_n_lines(lines, fout_bin, n, cancel_event=None):
+    """从行迭代器中按原始字节复制最多 n 行，返回实际复制的行数 (每 1024 行检查一次是否已取消)"""
+    write = fout_bin.write
+    copied = 0
+    while copied < n:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        block = 0
+        for line in islice(lines, min(_CANCEL_CHECK_LINES, n - copied)):
+            write(line)
+            block += 1
+        if not block:
+            break
+        copied += block
+    return copied
+
+
+def _find_split_offsets(file_path, part_sizes, bufsize=1 << 20, cancel_event=None):
+    """
+    按每份行数计算每一份在文件中的字节边界
+    返回 (表头字节, offsets, quotes_balanced)，第 i 份数据为 offsets[i]:offsets[i + 1] (行数为 0 的份不计入)
+    quotes_balanced 为 False 表示某个边界之前的引号数为奇数，即边界落在引号字段内部
+    cancel_event 被 set 后在下一块停止，返回的边界不完整
+    """
+    # 各份结束位置对应的累计行数，最后一份直接到文件末尾
+    targets = sorted(set(t for t in accumulate(part_sizes[:-1]) if t > 0))
+    with _open_binary_seq(file_path) as f:
+        header_bytes = f.readline()
+        pos = len(header_bytes)
+        offsets = [pos]
+        quotes = header_bytes.count(b'"')
+        quotes_balanced = quotes % 2 == 0
+        seen = 0
+        idx = 0
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            buf = f.read(bufsize)
+            if not buf:
+                break
+            start = 0
+            while idx < len(targets) and seen + buf.count(b'\n', start) >= targets[idx]:
+                # 定位本块内第 (target - seen) 个换行符
+                boundary = start
+                for _ in range(targets[idx] - seen):
+                    boundary = buf.find(b'\n', boundary) + 1
+                quotes += buf.count(b'"', start, boundary)
+                if quotes % 2:
+                    quotes_balanced = False
+                start = boundary
+                seen = targets[idx]
+                offsets.append(pos + start)
+                idx += 1
+            seen += buf.count(b'\n', start)
+            quotes += buf.count(b'"', start)
+            pos += len(buf)
+    if quotes % 2:
+        quotes_balanced = False
+    if offsets[-1] < pos:
+        offsets.append(pos)  # 最后一份
+    return header_bytes, offsets, quotes_balanced
+
+
+def _find_size_offsets(file_path, num_parts, sample_size=1 << 20):
+    """
+    按文件大小近似等分，每个边界向后对齐到下一行开头，无需统计行数
+    返回 (表头字节, offsets, 估算的数据行数, quotes_balanced)
+    quotes_balanced 为 False 表示某个边界后的一行引号数为奇数，即文件中存在跨行的引号字段
+    (只检查边界附近，不能保证发现所有跨行字段)
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        header_bytes = f.readline()
+        data_start = f.tell()
+        if size <= data_start:
+            return header_bytes, [data_start], 0, True  # 空文件或只有表头
+        sample = f.read(sample_size)
+
+        offsets = [data_start]
+        quotes_balanced = True
+        for k in range(1, num_parts):
+            target = data_start + (size - data_start) * k // num_parts
+            # 从 target 前一个字节读到行尾，恰好落在行首时不会跳过该行
+            f.seek(max(target, offsets[-1]) - 1)
+            f.readline()
+            pos = f.tell()
+            if offsets[-1] < pos < size:
+                offsets.append(pos)
+                if f.readline().count(b'"') % 2:
+                    quotes_balanced = False
+    if offsets[-1] < size:
+        offsets.append(size)
+
+    avg_line_len = len(sample) / max(1, sample.count(b'\n'))
+    approx_rows = round((size - data_start) / avg_line_len) if sample else 0
+    return header_bytes, offsets, approx_rows, quotes_balanced
+
+
+def _write_all(fd, data):
+    """os.write 可能只写出一部分，循环直到全部写完"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _splice(src_fd, dst_fd, src_off, length, mm, cancel_event=None, bufsize=1 << 20):
+    """
+    将源文件 [src_off, src_off + length) 的字节追加写入 dst_fd
+    优先使用内核态拷贝 (copy_file_range / sendfile)，都不可用时从 mmap 分块写出
+    每拷贝 _CANCEL_CHECK_BYTES 字节检查一次是否已取消，返回 False 表示因取消而未拷贝完
+    """
+    pos = src_off
+    end = src_off + length
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    copy_funcs = []
+    if hasattr(os, 'copy_file_range'):
+        copy_funcs.append(lambda off, n: os.copy_file_range(src_fd, dst_fd, n, offset_src=off))
+    if hasattr(os, 'sendfile'):
+        copy_funcs.append(lambda off, n: os.sendfile(dst_fd, src_fd, off, n))
+
+    for copy in copy_funcs:
+        try:
+            while pos < end:
+                if cancelled():
+                    return False
+                copied = copy(pos, min(end - pos, _CANCEL_CHECK_BYTES))
+                if not copied:
+                    break
+                pos += copied
+        except OSError:
+            continue  # 跨文件系统、内核不支持等情况，换下一种方式继续
+        if pos >= end:
+            return True
+
+    while pos < end:
+        if cancelled():
+            return False
+        chunk_end = min(pos + bufsize, end)
+        _write_all(dst_fd, mm[pos:chunk_end])
+        pos = chunk_end
+    return True
+
+
+def split_csv_logic(file_path, num_parts, output_folder, log_callback, progress_callback,
+                    precise_mode=False, cancel_event=None, force_csv=False):
     """
     核心拆分逻辑
     log_callback: 用于将文本输出到 GUI 的函数
     progress_callback: 用于控制进度条显示 (True/False)
+    precise_mode: True 时先统计总行数，保证每份行数相等；False 时按文件大小近似均分
+    cancel_event: threading.Event，被 set 后在下一个检查点停止拆分
+    force_csv: True 时始终用 csv 模块按记录拆分 (字段内含换行时最安全，但较慢)
     """
+    if cancel_event is None:
+        cancel_event = threading.Event()
+
+    def cancelled():
+        if cancel_event.is_set():
+            log_callback("🛑 已取消")
+            return True
+        return False
+
     try:
-        log_callback(f"🚀 开始处理: {os.path.basename(file_path)}")
+        input_path = Path(file_path)
+        out_dir = Path(output_folder)
+        base_name = input_path.stem
+
+        log_callback(f"🚀 开始处理: {input_path.name}")
         progress_callback(True)  # 显示进度条
 
-        if not os.path.exists(output_folder):
-            os.makedirs(output_folder)
+        if not out_dir.exists():
+            out_dir.mkdir(parents=True, exist_ok=True)
             log_callback(f"📂 创建输出目录: {output_folder}")
 
-        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        if cancelled():
+            return
 
         # --- 检测编码 ---
         log_callback("🔍 正在检测文件编码...")
-        encoding = detect_encoding(file_path)
+        encoding, strict_ok = detect_encoding(file_path)
         log_callback(f"✅ 检测到编码: {encoding}")
+        # 采样无法完整解码时直接以替换模式读写，避免拆到一半出错后整体重来
+        errors = 'strict' if strict_ok else 'replace'
 
         # --- 计算行数 ---
-        log_callback("📊 正在计算总行数 (这可能需要一点时间)...")
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                total_lines = sum(1 for _ in f)
-        except Exception:
-            # 降级重试
-            log_callback("⚠️ 标准读取失败，尝试忽略错误模式...")
-            with open(file_path, 'r', encoding=encoding, errors='ignore') as f:
-                total_lines = sum(1 for _ in f)
-
-        data_rows = total_lines - 1
-        if data_rows <= 0:
-            log_callback("❌ 错误: 数据行数不足 (仅包含表头或为空)")
-            progress_callback(False)
-            return
+        # by_records: csv 解析模式按记录拆分，需要按记录计数；
+        # 否则按物理行计数 (UTF-16 中 "上" U+4E0A 等字符含 0x0A 字节，也只能按记录计数)
+        def count_part_sizes(by_records):
+            nonlocal errors
+            log_callback("📊 正在计算总行数 (这可能需要一点时间)...")
+            if by_records:
+                try:
+                    data_rows = _count_csv_records(file_path, encoding, errors, cancel_event=cancel_event) - 1
+                except UnicodeDecodeError:
+                    # 采样之后才出现无法解码的字节，改为替换模式重新统计
+                    errors = 'replace'
+                    log_callback("⚠️ 文件包含无法解码的字符，将以替换字符代替")
+                    data_rows = _count_csv_records(file_path, encoding, errors, cancel_event=cancel_event) - 1
+            else:
+                total_lines, quotes = _count_lines_binary(file_path, cancel_event=cancel_event)
+                data_rows = total_lines - 1
+            if cancelled():
+                return None
+            if not by_records and quotes % 2:
+                return switch_to_csv()
+            if data_rows <= 0:
+                log_callback("❌ 错误: 数据行数不足 (仅包含表头或为空)")
+                return None
+
+            # 余数均摊到前几份，各份行数最多相差 1
+            q, r = divmod(data_rows, num_parts)
+            sizes = [q + 1 if i < r else q for i in range(num_parts)]
+            per_part = f"{q} ~ {q + 1}" if r else f"{q}"
+            log_callback(f"📋 总行数: {data_rows} | 拆分份数: {num_parts} | 每份约: {per_part} 行")
+            return sizes
 
-        chunk_size = math.ceil(data_rows / num_parts)
-        log_callback(f"📋 总行数: {data_rows} | 拆分份数: {num_parts} | 每份约: {chunk_size} 行")
+        # 全文件扫描发现跨行的引号字段时，物理行不等于记录，改为按记录重新统计
+        def switch_to_csv():
+            nonlocal use_csv
+            log_callback("⚠️ 检测到跨行的引号字段，改用 csv 解析模式拆分")
+            use_csv = True
+            return count_part_sizes(True)
 
         # --- 开始拆分 ---
+        # 取消时正在写的那一份不完整，删掉以免被当成正常结果
+        def discard_part(i, save_path):
+            try:
+                os.unlink(save_path)
+                log_callback(f"🛑 第 {i + 1} 份未写完，已删除: {save_path.name}")
+            except OSError:
+                log_callback(f"⚠️ 第 {i + 1} 份未写完，请手动删除: {save_path.name}")
+
         # 封装内部函数以复用代码
         def process_splitting(open_func_args):
             with open(file_path, 'r', **open_func_args) as f_in:
@@ -77,31 +498,170 @@ def split_csv_logic(file_path, num_parts, output_folder, log_callback, progress_
                     return  # 空文件
 
                 for i in range(num_parts):
-                    current_chunk_iter = islice(reader, chunk_size)
-                    try:
-                        first_row = next(current_chunk_iter)
-                    except StopIteration:
+                    if cancel_event.is_set():
+                        return
+                    # 分批取出行，每批一次 writerows，兼顾调用次数与内存占用
+                    batch = list(islice(reader, min(part_sizes[i], _CSV_BATCH_ROWS)))
+                    if not batch:
                         log_callback(f"🏁 数据已分完，提前结束。共生成 {i} 个文件。")
                         break
 
                     part_filename = f"{base_name}_part_{i + 1}.csv"
-                    save_path = os.path.join(output_folder, part_filename)
+                    save_path = out_dir / part_filename
 
-                    with open(save_path, 'w', encoding=encoding, newline='') as f_out:
-                        writer = csv.writer(f_out)
-                        writer.writerow(header)
-                        writer.writerow(first_row)
-                        writer.writerows(current_chunk_iter)
+                    with open(save_path, 'w', encoding=encoding, errors=errors, newline='') as f_out:
+                        writerows = csv.writer(f_out).writerows
+                        writerows([header])
+                        remaining = part_sizes[i]
+                        interrupted = False
+                        while batch:
+                            writerows(batch)
+                            remaining -= len(batch)
+                            if remaining <= 0:
+                                break
+                            if cancel_event.is_set():
+                                interrupted = True
+                                break
+                            batch = list(islice(reader, min(remaining, _CSV_BATCH_ROWS)))
 
+                    if interrupted:
+                        discard_part(i, save_path)
+                    if cancel_event.is_set():
+                        return
                     log_callback(f"💾 [{i + 1}/{num_parts}] 生成: {part_filename}")
-                    time.sleep(0.05)  # 稍微延迟一点点，让UI刷新更丝滑
 
-        # 尝试正常模式
-        try:
-            process_splitting({'encoding': encoding, 'newline': ''})
-        except Exception as e:
-            log_callback(f"⚠️ 正常模式出错: {e}，尝试忽略错误模式...")
-            process_splitting({'encoding': encoding, 'errors': 'ignore', 'newline': ''})
+        # 按字节逐行复制，不解析字段 (每份 = 表头原始字节 + part_sizes[i] 行原始字节)
+        def process_splitting_binary():
+            with _open_binary_seq(file_path) as f_in:
+                lines = _iter_lines_reusable(f_in)
+                header_line = next(lines, None)
+                if header_line is None:
+                    return  # 空文件
+                header_bytes = bytes(header_line)
+
+                for i in range(num_parts):
+                    if cancel_event.is_set():
+                        return
+                    first_line = next(lines, None) if part_sizes[i] else None
+                    if first_line is None:
+                        log_callback(f"🏁 数据已分完，提前结束。共生成 {i} 个文件。")
+                        break
+
+                    part_filename = f"{base_name}_part_{i + 1}.csv"
+                    save_path = out_dir / part_filename
+
+                    with open(save_path, 'wb') as f_out:
+                        f_out.write(header_bytes)
+                        f_out.write(first_line)
+                        copied = _copy_n_lines(lines, f_out, part_sizes[i] - 1, cancel_event)
+
+                    if cancel_event.is_set():
+                        if copied < part_sizes[i] - 1:
+                            discard_part(i, save_path)
+                        return
+                    log_callback(f"💾 [{i + 1}/{num_parts}] 生成: {part_filename}")
+
+        # 已知每份的字节边界后，各份互不依赖，可以多线程并行写出
+        # 返回 False 表示无法映射文件，此时尚未写出任何文件
+        def process_splitting_parallel(header_bytes, offsets):
+            parts = len(offsets) - 1
+
+            # 各线程并发读取不同区域，不是顺序读取，不需要大缓冲区和顺序预读提示
+            with open(file_path, 'rb') as f_in:
+                try:
+                    mm = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+                except (OSError, ValueError) as e:
+                    log_callback(f"⚠️ 无法映射文件: {e}，改用顺序复制...")
+                    return False
+                in_fd = f_in.fileno()
+
+                def write_part(i):
+                    if cancel_event.is_set():
+                        return
+                    part_filename = f"{base_name}_part_{i + 1}.csv"
+                    save_path = out_dir / part_filename
+                    out_fd = os.open(save_path, _OUT_FLAGS, 0o666)
+                    try:
+                        _write_all(out_fd, header_bytes)
+                        complete = _splice(in_fd, out_fd, offsets[i], offsets[i + 1] - offsets[i],
+                                           mm, cancel_event)
+                    finally:
+                        os.close(out_fd)
+                    if not complete:
+                        discard_part(i, save_path)
+                    if cancel_event.is_set():
+                        return
+                    log_callback(f"💾 [{i + 1}/{num_parts}] 生成: {part_filename}")
+
+                with mm:
+                    max_workers = min(parts, os.cpu_count() or 1)
+                    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                        for future in [executor.submit(write_part, i) for i in range(parts)]:
+                            future.result()
+
+            if parts < num_parts and not cancel_event.is_set():
+                log_callback(f"🏁 数据已分完，提前结束。共生成 {parts} 个文件。")
+            return True
+
+        # UTF-16 的换行不是单字节，引号内含换行时物理行不等于记录，这两种情况仍走 csv 模块
+        # 采样检查只覆盖文件开头，用户可以勾选强制 csv 模式
+        if force_csv:
+            use_csv = True
+            log_callback("⚠️ 已勾选强制 csv 解析模式")
+        elif encoding.startswith('utf-16') or _has_multiline_fields(file_path):
+            use_csv = True
+            log_callback("⚠️ 检测到引号内换行或 UTF-16 编码，使用 csv 解析模式拆分")
+        else:
+            use_csv = False
+
+        # 只有 csv 模式和精确模式需要事先统计总行数 (统计时可能切换为 csv 模式)
+        part_sizes = None
+        if use_csv or precise_mode:
+            part_sizes = count_part_sizes(use_csv)
+            if part_sizes is None:
+                return
+
+        if not use_csv:
+            if precise_mode:
+                header_bytes, offsets, quotes_balanced = _find_split_offsets(
+                    file_path, part_sizes, cancel_event=cancel_event)
+                if cancelled():
+                    return
+                if not quotes_balanced:
+                    part_sizes = switch_to_csv()
+                    if part_sizes is None:
+                        return
+            else:
+                # 按文件大小切分，省去一遍全文件的行数统计
+                header_bytes, offsets, approx_rows, quotes_balanced = _find_size_offsets(
+                    file_path, num_parts)
+                if len(offsets) < 2:
+                    log_callback("❌ 错误: 数据行数不足 (仅包含表头或为空)")
+                    return
+                if not quotes_balanced:
+                    part_sizes = switch_to_csv()
+                    if part_sizes is None:
+                        return
+                else:
+                    log_callback(f"📋 估算总行数: {approx_rows} | 拆分份数: {num_parts} | "
+                                 f"每份约: {math.ceil(approx_rows / num_parts)} 行 (按文件大小均分)")
+
+        if not use_csv and not process_splitting_parallel(header_bytes, offsets):
+            # 无法映射文件 (例如 32 位系统上的超大文件) 时退回顺序复制
+            if part_sizes is None:
+                part_sizes = count_part_sizes(False)
+                if part_sizes is None:
+                    return
+            if not use_csv:
+                process_splitting_binary()
+
+        if use_csv:
+            if not strict_ok:
+                log_callback("⚠️ 文件包含无法解码的字符，将以替换字符代替")
+            process_splitting({'encoding': encoding, 'errors': errors, 'newline': ''})
+
+        if cancelled():
+            return
 
         log_callback(f"🎉 处理完成！文件保存在: {output_folder}")
 
@@ -190,80 +750,39 @@ def main(page: ft.Page):
         bgcolor="#FFFFFF",
     )
 
-    # --- 文件选择器 (跨平台支持) ---
-    import platform
-    
-    def pick_file_cross_platform():
-        """跨平台文件选择对话框"""
-        system = platform.system()
-        
-        if system == "Darwin":  # macOS
-            script = '''
-            tell application "System Events"
-                activate
-                set theFile to choose file with prompt "选择 CSV 文件" of type {"csv", "public.comma-separated-values-text"}
-                return POSIX path of theFile
-            end tell
-            '''
-            try:
-                result = subprocess.run(
-                    ['osascript', '-e', script],
-                    capture_output=True,
-                    text=True,
-                    timeout=60
-                )
-                if result.returncode == 0:
-                    return result.stdout.strip()
-            except Exception:
-                pass
-                
-        elif system == "Windows":
-            ps_script = '''
-            Add-Type -AssemblyName System.Windows.Forms
-            $dialog = New-Object System.Windows.Forms.OpenFileDialog
-            $dialog.Title = "选择 CSV 文件"
-            $dialog.Filter = "CSV 文件 (*.csv)|*.csv|所有文件 (*.*)|*.*"
-            $dialog.InitialDirectory = [Environment]::GetFolderPath('Desktop')
-            if ($dialog.ShowDialog() -eq [System.Windows.Forms.DialogResult]::OK) {
-                Write-Output $dialog.FileName
-            }
-            '''
-            try:
-                result = subprocess.run(
-                    ['powershell', '-Command', ps_script],
-                    capture_output=True,
-                    text=True,
-                    timeout=60
-                )
-                if result.returncode == 0 and result.stdout.strip():
-                    return result.stdout.strip()
-            except Exception:
-                pass
-                
-        else:  # Linux
-            try:
-                result = subprocess.run(
-                    ['zenity', '--file-selection', '--title=选择 CSV 文件', '--file-filter=CSV files (csv) | *.csv'],
-                    capture_output=True,
-                    text=True,
-                    timeout=60
-                )
-                if result.returncode == 0:
-                    return result.stdout.strip()
-            except Exception:
-                pass
-        
-        return None
+    chk_precise = ft.Checkbox(
+        label="精确等分行数 (需额外统计一遍总行数，大文件较慢)",
+        value=False,
+    )
 
-    # 定义按钮点击事件处理函数
-    def pick_file_clicked(e):
-        file_path = pick_file_cross_platform()
+    chk_force_csv = ft.Checkbox(
+        label="强制 csv 解析模式 (字段内含换行时勾选，速度较慢)",
+        value=False,
+    )
+
+    # --- 文件选择器 (使用 Flet 原生对话框) ---
+    def on_file_picked(e: ft.FilePickerResultEvent):
+        if not e.files:
+            return
+        file_path = e.files[0].path
         if file_path:
             txt_file_path.value = file_path
             dir_name = os.path.dirname(file_path)
             txt_output_path.value = os.path.join(dir_name, "output_csv")
             page.update()
-    
+
+    file_picker = ft.FilePicker(on_result=on_file_picked)
+    page.overlay.append(file_picker)
+
+    # 定义按钮点击事件处理函数
+    def pick_file_clicked(e):
+        file_picker.pick_files(
+            dialog_title="选择 CSV 文件",
+            file_type=ft.FilePickerFileType.CUSTOM,
+            allowed_extensions=["csv"],
+            allow_multiple=False,
+        )
+
     btn_pick_file = ft.ElevatedButton(
         "选择文件",
         icon=ft.Icons.FOLDER_OPEN,
@@ -304,43 +823,78 @@ def main(page: ft.Page):
     # --- 辅助函数：更新日志 ---
     from datetime import datetime
     
+    # 日志先进入待处理队列，由定时器每 LOG_FLUSH_INTERVAL 秒统一刷新一次界面，
+    # 避免后台线程每写一条日志就触发一次 page.update()
+    LOG_FLUSH_INTERVAL = 0.05
+    LOG_MAX_ENTRIES = 500
+    # 日志开头图标 -> (文字颜色, 背景色)
+    LOG_COLORS = {
+        "❌": ("#DC2626", "#FEF2F2"),
+        "⚠️": ("#D97706", "#FFFBEB"),
+        "🛑": ("#D97706", "#FFFBEB"),
+        "🎉": ("#059669", "#ECFDF5"),
+        "📂": ("#4F46E5", None),
+        "💾": ("#4F46E5", None),
+        "⏳": ("#6366F1", None),
+        "🚀": ("#6366F1", None),
+    }
+    log_lock = threading.Lock()
+    pending_logs = []
+    flush_timer = None
+
     def append_log(message: str):
+        nonlocal flush_timer
         # 获取当前时间
         timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        # 根据消息类型设置颜色
-        color = "#334155"
-        bg_color = None
-        if "❌" in message:
-            color = "#DC2626"
-            bg_color = "#FEF2F2"
-        elif "⚠️" in message:
-            color = "#D97706"
-            bg_color = "#FFFBEB"
-        elif "🎉" in message:
-            color = "#059669"
-            bg_color = "#ECFDF5"
-        elif "📂" in message or "💾" in message:
-            color = "#4F46E5"
-        elif "⏳" in message or "🚀" in message:
-            color = "#6366F1"
-
-        # 创建日志条目
-        log_entry = ft.Container(
-            content=ft.Row(
-                [
-                    ft.Text(f"[{timestamp}]", size=11, color="#94A3B8", width=70),
-                    ft.Text(message, size=13, color=color, expand=True),
-                ],
-                spacing=8,
-            ),
-            bgcolor=bg_color,
-            padding=ft.padding.symmetric(horizontal=8, vertical=4),
-            border_radius=6,
-        )
-        
-        log_view.controls.append(log_entry)
-        page.update()
+
+        with log_lock:
+            pending_logs.append((timestamp, message))
+            if flush_timer is None:
+                flush_timer = threading.Timer(LOG_FLUSH_INTERVAL, flush_logs)
+                flush_timer.daemon = True
+                flush_timer.start()
+
+    def flush_logs():
+        nonlocal flush_timer
+        with log_lock:
+            entries = pending_logs[:]
+            pending_logs.clear()
+            flush_timer = None
+
+            for timestamp, message in entries:
+                # 根据消息开头的图标设置颜色
+                color, bg_color = "#334155", None
+                for icon, colors in LOG_COLORS.items():
+                    if message.startswith(icon):
+                        color, bg_color = colors
+                        break
+
+                # 创建日志条目
+                log_entry = ft.Container(
+                    content=ft.Row(
+                        [
+                            ft.Text(f"[{timestamp}]", size=11, color="#94A3B8", width=70),
+                            ft.Text(message, size=13, color=color, expand=True),
+                        ],
+                        spacing=8,
+                    ),
+                    bgcolor=bg_color,
+                    padding=ft.padding.symmetric(horizontal=8, vertical=4),
+                    border_radius=6,
+                )
+                log_view.controls.append(log_entry)
+
+            # 只保留最近的日志，控制每次 page.update() 的数据量
+            if len(log_view.controls) > LOG_MAX_ENTRIES:
+                del log_view.controls[:-LOG_MAX_ENTRIES]
+
+        if entries:
+            page.update()
+
+    def clear_logs():
+        with log_lock:
+            pending_logs.clear()
+            log_view.controls.clear()
 
     # 初始欢迎消息
     append_log("📋 欢迎使用 CSV 智能拆分工具，请选择文件开始操作")
@@ -349,10 +903,15 @@ def main(page: ft.Page):
         progress_bar.visible = is_loading
         btn_run.disabled = is_loading
         btn_pick_file.disabled = is_loading
+        btn_cancel.visible = is_loading
         page.update()
 
+    # 当前任务的取消标志，每次启动新任务时替换
+    cancel_event = None
+
     # --- 按钮点击事件 ---
     def on_run_click(e):
+        nonlocal cancel_event
         file_path = txt_file_path.value
         num_str = txt_num_parts.value
         output_folder = txt_output_path.value
@@ -364,16 +923,27 @@ def main(page: ft.Page):
             append_log("❌ 错误：拆分份数必须是正整数")
             return
 
-        log_view.controls.clear()
+        # 停止可能仍在运行的上一个任务，避免两个任务争抢磁盘
+        if cancel_event is not None:
+            cancel_event.set()
+        cancel_event = threading.Event()
+
+        clear_logs()
         append_log("⏳ 准备开始任务...")
 
         task_thread = threading.Thread(
             target=split_csv_logic,
-            args=(file_path, int(num_str), output_folder, append_log, set_loading),
+            args=(file_path, int(num_str), output_folder, append_log, set_loading,
+                  chk_precise.value, cancel_event, chk_force_csv.value),
             daemon=True
         )
         task_thread.start()
 
+    def on_cancel_click(e):
+        if cancel_event is not None and not cancel_event.is_set():
+            cancel_event.set()
+            append_log("⏳ 正在取消任务...")
+
     btn_run = ft.ElevatedButton(
         "🚀 开始执行拆分",
         on_click=on_run_click,
@@ -386,6 +956,17 @@ def main(page: ft.Page):
         height=50,
     )
 
+    btn_cancel = ft.OutlinedButton(
+        "🛑 取消",
+        on_click=on_cancel_click,
+        visible=False,
+        style=ft.ButtonStyle(
+            color="#DC2626",
+            shape=ft.RoundedRectangleBorder(radius=10),
+        ),
+        height=50,
+    )
+
     # 2.3 组装布局
 
     # 配置卡片
@@ -402,6 +983,8 @@ def main(page: ft.Page):
                 ft.Divider(height=20, color="#E2E8F0"),
                 ft.Row([txt_file_path, btn_pick_file], spacing=10),
                 ft.Row([txt_num_parts, txt_output_path], spacing=15),
+                chk_precise,
+                chk_force_csv,
             ],
             spacing=15,
         ),
@@ -420,7 +1003,7 @@ def main(page: ft.Page):
     action_section = ft.Column(
         [
             progress_bar,
-            btn_run,
+            ft.Row([btn_run, btn_cancel], alignment=ft.MainAxisAlignment.CENTER, spacing=15),
         ],
         horizontal_alignment=ft.CrossAxisAlignment.CENTER,
         spacing=15,